@@ -2,62 +2,79 @@
 Agent to handle upload failures from CLI -> Structurizr Cloud.
 """
 
+import functools
+import os
+import re
 import subprocess
 import shutil
 import requests
+from requests.adapters import HTTPAdapter
 from pathlib import Path
 from typing import Dict, Any
 
+# Shared session so repeated recovery attempts reuse the TCP+TLS
+# connection to structurizr.com instead of handshaking every time
+_SESSION = requests.Session()
+_SESSION.headers.update({"User-Agent": "road-agent/1"})
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+# Failure categories in match-priority order, each compiled to a single
+# case-insensitive pattern so classification is one scan per category
+_CLASSIFIERS = [
+    ("missing_cli", re.compile(r"command not found|structurizr-cli|no such file", re.I)),
+    ("auth_error", re.compile(r"unauthorized|401|invalid key|authentication|incorrect api key", re.I)),
+    ("network_error", re.compile(r"network|timeout|connection|dns", re.I)),
+    ("workspace_error", re.compile(r"workspace|403|forbidden|not found", re.I)),
+]
+
+# Memoized PATH lookup - which() walks and stats every PATH entry
+_which = functools.lru_cache(maxsize=32)(shutil.which)
+
 class UploadFailureRecoveryAgent:
     """Diagnoses and attempts to fix upload failures"""
-    
+
+    def __init__(self):
+        # Classification label -> bound handler, so dispatch is a single
+        # dict lookup and new failure types just add an entry
+        self._handlers = {
+            "missing_cli": self._handle_missing_cli,
+            "auth_error": self._handle_auth_error,
+            "network_error": self._handle_network_error,
+            "workspace_error": self._handle_workspace_error,
+        }
+
     def diagnose_and_retry(self, error_output: str, dsl_file: Path, config: Dict) -> Dict[str, Any]:
         """Main recovery method"""
-        
+
         failure_type = self._classify_failure(error_output)
-        
+
         print(f"Upload failed: {failure_type}")
         print("Attempting recovery...")
-        
-        if failure_type == "missing_cli":
-            return self._handle_missing_cli(dsl_file, config)
-        elif failure_type == "auth_error":
-            return self._handle_auth_error(dsl_file, config)
-        elif failure_type == "network_error":
-            return self._handle_network_error(dsl_file, config)
-        elif failure_type == "workspace_error":
-            return self._handle_workspace_error(dsl_file, config)
-        else:
+
+        handler = self._handlers.get(failure_type)
+        if handler is None:
             return self._fallback_to_manual(dsl_file)
+        return handler(dsl_file, config)
     
     def _classify_failure(self, error_output: str) -> str:
         """Classify the type of failure from error output"""
-        error_lower = error_output.lower()
-        
-        if any(phrase in error_lower for phrase in ["command not found", "structurizr-cli", "no such file"]):
-            return "missing_cli"
-        elif any(phrase in error_lower for phrase in ["unauthorized", "401", "invalid key", "authentication", "incorrect api key"]):
-            return "auth_error" 
-        elif any(phrase in error_lower for phrase in ["network", "timeout", "connection", "dns"]):
-            return "network_error"
-        elif any(phrase in error_lower for phrase in ["workspace", "403", "forbidden", "not found"]):
-            return "workspace_error"
-        else:
-            return "unknown"
+        for failure_type, pattern in _CLASSIFIERS:
+            if pattern.search(error_output):
+                return failure_type
+        return "unknown"
     
     def _handle_missing_cli(self, dsl_file: Path, config: Dict) -> Dict[str, Any]:
         """Handle missing Structurizr CLI"""
         
-        # Try to find CLI in common locations
-        possible_paths = [
-            "structurizr-cli",
-            "./bin/structurizr-cli", 
-            "/usr/local/bin/structurizr-cli",
-            shutil.which("structurizr-cli")
-        ]
-        
-        for path in possible_paths:
-            if path and shutil.which(path):
+        # Check PATH once (memoized), then probe the known locations
+        # directly instead of walking PATH again for each of them
+        resolved = _which("structurizr-cli")
+        if resolved:
+            print(f"Found CLI at: {resolved}")
+            return self._retry_upload_with_cli(dsl_file, config, resolved)
+
+        for path in ("./bin/structurizr-cli", "/usr/local/bin/structurizr-cli"):
+            if os.access(path, os.X_OK):
                 print(f"Found CLI at: {path}")
                 return self._retry_upload_with_cli(dsl_file, config, path)
         
@@ -91,7 +108,7 @@ class UploadFailureRecoveryAgent:
         # Test if workspace is accessible
         workspace_url = f"https://api.structurizr.com/workspace/{workspace_id}"
         try:
-            response = requests.head(workspace_url, timeout=5)
+            response = _SESSION.head(workspace_url, timeout=5)
             if response.status_code == 404:
                 return {
                     "recovery_successful": False,
@@ -102,7 +119,7 @@ class UploadFailureRecoveryAgent:
                         "Verify workspace exists at https://structurizr.com/workspace/{workspace_id}"
                     ]
                 }
-        except:
+        except requests.RequestException:
             pass
         
         return {
@@ -123,20 +140,26 @@ class UploadFailureRecoveryAgent:
         
         # Test basic connectivity
         try:
-            response = requests.get("https://structurizr.com", timeout=5)
-            if response.status_code == 200:
-                print("Network seems OK, retrying upload...")
-                # Retry the upload once
+            response = _SESSION.get("https://structurizr.com", timeout=5)
+        except requests.RequestException:
+            response = None
+
+        if response is not None and response.status_code == 200:
+            print("Network seems OK, retrying upload...")
+            # Retry the upload once; any failure here (missing config,
+            # missing credentials, ...) degrades to the failure dict
+            # below rather than crashing the recovery node
+            try:
                 from cli.upload_dsl import upload_dsl_file
                 success = upload_dsl_file(str(dsl_file), config_path="config.yaml")
-                
-                if success:
-                    return {
-                        "recovery_successful": True,
-                        "method": "retry_upload"
-                    }
-        except:
-            pass
+            except Exception:
+                success = False
+
+            if success:
+                return {
+                    "recovery_successful": True,
+                    "method": "retry_upload"
+                }
         
         return {
             "recovery_successful": False,
@@ -166,24 +189,35 @@ class UploadFailureRecoveryAgent:
             ]
         }
     
-    def _retry_upload_with_cli(self, dsl_file: Path, config: Dict, cli_path: str) -> Dict[str, Any]:
-        """Retry upload with specific CLI path"""
+    def _retry_upload_with_cli(self, dsl_file, config: Dict, cli_path: str) -> Dict[str, Any]:
+        """
+        Retry upload with specific CLI path.
+
+        Accepts a single Path or a list of Paths; a batch reuses the one
+        resolved CLI path for every push so the (expensive) CLI discovery
+        is paid once rather than per file.
+        """
         from cli.upload_dsl import upload_dsl_with_cli
-        
+
         structurizr_config = config.get('structurizr', {})
-        
+        dsl_files = dsl_file if isinstance(dsl_file, (list, tuple)) else [dsl_file]
+
         try:
-            success = upload_dsl_with_cli(
-                dsl_file=str(dsl_file),
-                api_key=structurizr_config.get('api_key'),
-                api_secret=structurizr_config.get('api_secret'),
-                workspace_id=structurizr_config.get('workspace_id'),
-                cli_path=cli_path
-            )
-            
+            uploaded = 0
+            for path in dsl_files:
+                if upload_dsl_with_cli(
+                    dsl_file=str(path),
+                    api_key=structurizr_config.get('api_key'),
+                    api_secret=structurizr_config.get('api_secret'),
+                    workspace_id=structurizr_config.get('workspace_id'),
+                    cli_path=cli_path
+                ):
+                    uploaded += 1
+
             return {
-                "recovery_successful": success,
-                "method": f"retry_with_cli_path:{cli_path}"
+                "recovery_successful": uploaded == len(dsl_files),
+                "method": f"retry_with_cli_path:{cli_path}",
+                "files_uploaded": uploaded
             }
         except Exception as e:
             return {
@@ -4,6 +4,7 @@ Check which OpenAI models you have access to
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 
 # Make sure your API key is set
@@ -28,23 +29,46 @@ models_to_test = [
     "gpt-4o-mini",
 ]
 
-available_models = []
-
-for model in models_to_test:
+def probe(model):
+    """Try a minimal completion; the OpenAI client is thread-safe"""
     try:
-        # Try a minimal completion
-        response = client.chat.completions.create(
+        client.chat.completions.create(
             model=model,
             messages=[{"role": "user", "content": "Hi"}],
             max_tokens=1
         )
-        print(f"{model}: Available")
-        available_models.append(model)
+        return model, True, None
     except Exception as e:
-        if "model_not_found" in str(e):
+        return model, False, str(e)
+
+
+available_models = []
+
+try:
+    # One list call replaces a billed completion per model
+    available_ids = {m.id for m in client.models.list().data}
+    for model in models_to_test:
+        if model in available_ids:
+            print(f"{model}: Available")
+            available_models.append(model)
+        else:
+            print(f"{model}: Not available")
+except Exception as e:
+    print(f"Could not list models ({str(e)[:50]}), probing individually...")
+
+    # Fallback: probe all models concurrently - wall time is the slowest
+    # round-trip instead of the sum of all of them
+    with ThreadPoolExecutor(max_workers=len(models_to_test)) as executor:
+        results = list(executor.map(probe, models_to_test))
+
+    for model, available, error in results:
+        if available:
+            print(f"{model}: Available")
+            available_models.append(model)
+        elif "model_not_found" in error:
             print(f"{model}: Not available")
         else:
-            print(f"{model}: Error - {str(e)[:50]}")
+            print(f"{model}: Error - {error[:50]}")
 
 print("\n" + "="*50)
 print(f"You have access to {len(available_models)} model(s):")
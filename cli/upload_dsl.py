@@ -2,13 +2,53 @@
 upload_dsl.py - Simple CLI tool to upload DSL files to Structurizr using the Structurizr CLI
 """
 import sys
-import yaml
+import functools
+import hashlib
+import json
 import webbrowser
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional
 import argparse
 
+# One loader for the whole project: evaluator.config owns the lru cache
+# and the pickled sidecar, so the CLI and the workflow share both the
+# in-process cache and the cold-start artifact instead of fighting over
+# the sidecar with different stamp formats. Direct script execution
+# (python cli/upload_dsl.py ...) puts cli/ first on sys.path, not the
+# repo root, so bootstrap the root before falling over.
+try:
+    from evaluator.config import get_config as _load_config
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from evaluator.config import get_config as _load_config
+
+
+# Last successfully uploaded DSL hash per workspace; a byte-identical
+# DSL skips the network round trip entirely
+_UPLOAD_CACHE_PATH = Path('.structurizr_upload_cache.json')
+
+
+def _load_upload_cache() -> Dict:
+    try:
+        with open(_UPLOAD_CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_upload_cache(cache: Dict) -> None:
+    """Write atomically; failure to cache is not an error"""
+    try:
+        tmp_path = _UPLOAD_CACHE_PATH.with_name(_UPLOAD_CACHE_PATH.name + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+        tmp_path.replace(_UPLOAD_CACHE_PATH)
+    except OSError:
+        pass
+
+
 class StructurizrClient:
     """Client for Structurizr interactions"""
     
@@ -24,18 +64,20 @@ class StructurizrClient:
         """
         # Load from config if not provided
         if not all([api_key, api_secret, workspace_id]):
-            with open(config_path, 'r') as f:
-                config = yaml.safe_load(f)
-                structurizr_config = config.get('structurizr', {})
-                
-                api_key = api_key or structurizr_config.get('api_key')
-                api_secret = api_secret or structurizr_config.get('api_secret')
-                workspace_id = workspace_id or structurizr_config.get('workspace_id')
+            config = _load_config(config_path)
+            structurizr_config = config.get('structurizr', {})
+
+            api_key = api_key or structurizr_config.get('api_key')
+            api_secret = api_secret or structurizr_config.get('api_secret')
+            workspace_id = workspace_id or structurizr_config.get('workspace_id')
         
         self.api_key = api_key
         self.api_secret = api_secret
         self.workspace_id = workspace_id
         self.base_url = "https://api.structurizr.com"
+        self.config_path = config_path
+        # Stat the config once here rather than on every upload call
+        self._config_present = Path(config_path).is_file()
         
         # Validate credentials
         if not all([self.api_key, self.api_secret, self.workspace_id]):
@@ -53,10 +95,20 @@ class StructurizrClient:
         """
         Upload DSL to Structurizr Cloud using the Structurizr CLI.
         """
-        if not Path(dsl_file).exists():
+        try:
+            dsl_hash = hashlib.sha256(Path(dsl_file).read_bytes()).hexdigest()
+        except OSError:
             print(f"Error: DSL file not found: {dsl_file}")
             return False
 
+        # Identical content already in the workspace - skip the push
+        cache = _load_upload_cache()
+        if cache.get(str(workspace_id)) == dsl_hash:
+            workspace_url = f"https://structurizr.com/workspace/{workspace_id}"
+            print(f"DSL unchanged since last upload, skipping: {dsl_file}")
+            print(f"View at: {workspace_url}")
+            return True
+
         cmd = [
             cli_path, "push",
             "-id", str(workspace_id),
@@ -65,21 +117,27 @@ class StructurizrClient:
             "-w", dsl_file
         ]
         print(f"Running: {cli_path} push -id {workspace_id} -key ***** -secret ***** -w {dsl_file}")
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        print(result.stdout)
+        # Capture bytes and decode lazily - only output we actually print
+        # or store pays for a decode
+        result = subprocess.run(cmd, capture_output=True)
+        if result.stdout:
+            print(result.stdout.decode('utf-8', errors='replace'))
         if result.returncode == 0:
             print("Upload successful!")
+            cache[str(workspace_id)] = dsl_hash
+            _save_upload_cache(cache)
             workspace_url = f"https://structurizr.com/workspace/{workspace_id}"
             print(f"View at: {workspace_url}")
             if open_browser:
                 webbrowser.open(workspace_url)
             return True
         else:
+            stderr = result.stderr.decode('utf-8', errors='replace')
             print("Upload failed!")
-            print(result.stderr)
+            print(stderr)
 
             # Store the CLI error for recovery agent access
-            self.last_cli_error = result.stderr
+            self.last_cli_error = stderr
 
             return False
 
@@ -96,26 +154,29 @@ class StructurizrClient:
         """
         Upload a DSL file to Structurizr using the CLI, or provide manual instructions.
         """
-        # Read DSL file
-        if not Path(dsl_file).exists():
+        # Stat the DSL file once - covers both the existence check and the
+        # size report without reading the whole file into memory
+        try:
+            dsl_stat = Path(dsl_file).stat()
+        except OSError:
             print(f"Error: DSL file not found: {dsl_file}")
             return False
 
-        with open(dsl_file, 'r') as f:
-            dsl_content = f.read()
-
         print(f"Read DSL from: {dsl_file}")
-        print(f"Size: {len(dsl_content)} characters")
+        print(f"Size: {dsl_stat.st_size} characters")
 
         # Load config if credentials not provided
         if not all([api_key, api_secret, workspace_id]):
-            if Path(config_path).exists():
-                with open(config_path, 'r') as f:
-                    config = yaml.safe_load(f)
-                    structurizr_config = config.get('structurizr', {})
-                    api_key = api_key or structurizr_config.get('api_key')
-                    api_secret = api_secret or structurizr_config.get('api_secret')
-                    workspace_id = workspace_id or structurizr_config.get('workspace_id')
+            config_present = (
+                self._config_present if config_path == self.config_path
+                else Path(config_path).is_file()
+            )
+            if config_present:
+                config = _load_config(config_path)
+                structurizr_config = config.get('structurizr', {})
+                api_key = api_key or structurizr_config.get('api_key')
+                api_secret = api_secret or structurizr_config.get('api_secret')
+                workspace_id = workspace_id or structurizr_config.get('workspace_id')
 
         # Check if we have credentials
         if all([api_key, api_secret, workspace_id]):
@@ -134,6 +195,91 @@ class StructurizrClient:
             return success
 
 
+@functools.lru_cache(maxsize=8)
+def get_client(config_path: str = "config.yaml") -> "StructurizrClient":
+    """Shared client per config path so repeated upload calls in one
+    process don't rebuild the client (and reload config) each time"""
+    return StructurizrClient(config_path=config_path)
+
+
+def upload_dsl_file(
+    dsl_file: str,
+    api_key: Optional[str] = None,
+    api_secret: Optional[str] = None,
+    workspace_id: Optional[int] = None,
+    config_path: str = "config.yaml",
+    open_browser: bool = True
+) -> bool:
+    """
+    Module-level upload entry point so callers (workflow nodes, recovery
+    agent) can upload in-process instead of spawning a fresh interpreter.
+    """
+    client = StructurizrClient(
+        api_key=api_key,
+        api_secret=api_secret,
+        workspace_id=workspace_id,
+        config_path=config_path
+    )
+    return client.upload_dsl_file(
+        dsl_file=dsl_file,
+        api_key=api_key,
+        api_secret=api_secret,
+        workspace_id=workspace_id,
+        config_path=config_path,
+        open_browser=open_browser
+    )
+
+
+def upload_many(
+    dsl_files: List[str],
+    config_path: str = "config.yaml",
+    workers: int = 8
+) -> List[bool]:
+    """
+    Upload several DSL files concurrently, one CLI push per file.
+
+    Each push spends most of its time waiting on the network, so
+    overlapping them bounds batch wall time by the slowest upload
+    rather than the sum. Browser opening is suppressed - popping one
+    tab per workspace in a batch helps nobody.
+    """
+    client = get_client(config_path=config_path)
+
+    def _push(dsl_file: str) -> bool:
+        return client.upload_dsl_file(
+            dsl_file=dsl_file,
+            config_path=config_path,
+            open_browser=False
+        )
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(dsl_files) or 1)) as executor:
+        return list(executor.map(_push, dsl_files))
+
+
+def upload_dsl_with_cli(
+    dsl_file: str,
+    api_key: str,
+    api_secret: str,
+    workspace_id: int,
+    cli_path: str = "structurizr-cli",
+    open_browser: bool = True
+) -> bool:
+    """Module-level wrapper around StructurizrClient.upload_dsl_with_cli"""
+    client = StructurizrClient(
+        api_key=api_key,
+        api_secret=api_secret,
+        workspace_id=workspace_id
+    )
+    return client.upload_dsl_with_cli(
+        dsl_file=dsl_file,
+        api_key=api_key,
+        api_secret=api_secret,
+        workspace_id=workspace_id,
+        cli_path=cli_path,
+        open_browser=open_browser
+    )
+
+
 def main():
     """Main CLI entry point"""
 
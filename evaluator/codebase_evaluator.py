@@ -3,18 +3,37 @@ evaluator.py - Uses LLM to evaluate if codebase is suitable for C4 generation
 """
 import json
 from typing import Dict, Optional
-import yaml
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 
+from evaluator.config import get_config
+
+
+def build_prompt_payload(analysis: Dict) -> Dict:
+    """
+    Derive the string fields the evaluation prompt needs from an
+    analysis result.
+
+    Computed once per analysis (the workflow does it in analyse_node) so
+    repeated prompt construction reuses the joined/truncated strings.
+    """
+    metrics = analysis['metrics']
+    structure = analysis['structure']
+    samples = analysis['samples']
+    return {
+        'frameworks_str': ', '.join(metrics['frameworks']) if metrics['frameworks'] else 'None detected',
+        'entry_points_str': ', '.join(structure['entry_points'][:3]) if structure['entry_points'] else 'None found',
+        'sample_file': samples[0]['file'] if samples else 'N/A',
+        'code_preview': samples[0]['preview'][:500] if samples else 'No samples available'
+    }
+
 
 class ComplexityEvaluator:
     """Evaluates codebase complexity using LLM"""
-    
+
     def __init__(self, llm: Optional[ChatOpenAI] = None, config_path: str = "config.yaml"):
         """Initialize with an LLM instance"""
-        with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
+        self.config = get_config(config_path)
 
         if llm is None: 
             llm_config = self.config['llm']
@@ -25,6 +44,7 @@ class ComplexityEvaluator:
             )
 
         self.llm = llm or ChatOpenAI(model="gpt-4", temperature=0.1)
+        self._system_message = None
     
     def evaluate(self, analysis: Dict) -> Dict:
         """
@@ -38,26 +58,45 @@ class ComplexityEvaluator:
         """
         prompt = self._create_prompt(analysis)
         response = self.llm.invoke(prompt)
-        
+        return self._parse_response(response.content)
+
+    async def aevaluate(self, analysis: Dict) -> Dict:
+        """
+        Async variant of evaluate.
+
+        Awaiting the LLM call frees the event loop for other work (e.g.
+        overlapping evaluation across repos) instead of blocking the
+        whole pipeline on one OpenAI round trip.
+        """
+        prompt = self._create_prompt(analysis)
+        response = await self.llm.ainvoke(prompt)
+        return self._parse_response(response.content)
+
+    def _parse_response(self, content: str) -> Dict:
+        """Parse the LLM's decision, falling back to heuristics"""
         try:
             # Parse JSON response
-            decision = json.loads(response.content)
+            return json.loads(content)
         except:
             # Fallback if JSON parsing fails
-            decision = self._create_fallback_decision(response.content)
-        
-        return decision
-    
+            return self._create_fallback_decision(content)
+
     def _create_prompt(self, analysis: Dict) -> list:
         """Create the evaluation prompt for the LLM"""
         metrics = analysis['metrics']
         structure = analysis['structure']
-        samples = analysis['samples']
-        
-        system_message = self.config['prompts']['system_message'].format(
-            simple_max_files=self.config['complexity']['simple']['max_files'],
-            moderate_max_files=self.config['complexity']['moderate']['max_files']
-        )
+
+        # The thresholds never change within a run, so the rendered
+        # system message is cached on first use
+        if self._system_message is None:
+            self._system_message = self.config['prompts']['system_message'].format(
+                simple_max_files=self.config['complexity']['simple']['max_files'],
+                moderate_max_files=self.config['complexity']['moderate']['max_files']
+            )
+
+        # The joined/truncated strings may already have been computed by
+        # the analyse node; derive them here otherwise
+        payload = analysis.get('prompt_payload') or build_prompt_payload(analysis)
 
         # Build analysis summary using template
         summary = self.config['prompts']['evaluation_template'].format(
@@ -65,16 +104,16 @@ class ComplexityEvaluator:
             lines=metrics['lines'],
             classes=metrics['classes'],
             functions=metrics['functions'],
-            frameworks=', '.join(metrics['frameworks']) if metrics['frameworks'] else 'None detected',
+            frameworks=payload['frameworks_str'],
             has_tests=structure['has_tests'],
-            entry_points=', '.join(structure['entry_points'][:3]) if structure['entry_points'] else 'None found',
+            entry_points=payload['entry_points_str'],
             packages=len(structure['packages']),
-            sample_file=samples[0]['file'] if samples else 'N/A',
-            code_preview=samples[0]['preview'][:500] if samples else 'No samples available'
+            sample_file=payload['sample_file'],
+            code_preview=payload['code_preview']
         )
 
         return [
-            SystemMessage(content=system_message),
+            SystemMessage(content=self._system_message),
             HumanMessage(content=summary)
         ]
     
@@ -0,0 +1,87 @@
+"""
+config.py - Shared, cached loading of the project's YAML configuration
+"""
+import functools
+import os
+import pickle
+from dataclasses import dataclass
+from typing import Dict, Optional
+import yaml
+
+# Prefer the libyaml-backed C loader - same output as safe_load, much faster
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+
+@functools.lru_cache(maxsize=8)
+def _load_config(config_path: str, mtime: float) -> Dict:
+    # A pickled sidecar (same idiom as cli/upload_dsl.py) lets cold CLI
+    # runs skip the YAML parse; unpickling the dict is much cheaper
+    cache_path = config_path + ".cache.pkl"
+    try:
+        with open(cache_path, 'rb') as f:
+            saved_mtime, config = pickle.load(f)
+        if saved_mtime == mtime:
+            return config
+    except (OSError, pickle.PickleError, EOFError, ValueError):
+        pass
+
+    with open(config_path, 'r') as f:
+        config = yaml.load(f, Loader=_YamlLoader) or {}
+
+    # Write the sidecar atomically; failure to cache is not an error
+    try:
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((mtime, config), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+    return config
+
+
+def get_config(config_path: str = "config.yaml") -> Dict:
+    """
+    Return the parsed config for config_path.
+
+    The parse is cached keyed on (path, mtime), so every analyser,
+    evaluator and workflow node in one run shares a single parsed dict
+    and an edited config still takes effect on the next call.
+    """
+    return _load_config(config_path, os.path.getmtime(config_path))
+
+
+@dataclass(frozen=True, slots=True)
+class StructurizrConfig:
+    """Typed view of the structurizr config section"""
+    api_key: Optional[str]
+    api_secret: Optional[str]
+    workspace_id: Optional[int]
+    auto_open_browser: bool = True
+
+    def is_configured(self) -> bool:
+        return all((self.api_key, self.api_secret, self.workspace_id))
+
+
+@functools.lru_cache(maxsize=8)
+def _structurizr_config(config_path: str, mtime: float) -> StructurizrConfig:
+    section = _load_config(config_path, mtime).get('structurizr') or {}
+    return StructurizrConfig(
+        api_key=section.get('api_key'),
+        api_secret=section.get('api_secret'),
+        workspace_id=section.get('workspace_id'),
+        auto_open_browser=section.get('auto_open_browser', True)
+    )
+
+
+def get_structurizr_config(config_path: str = "config.yaml") -> StructurizrConfig:
+    """
+    Return the structurizr section as a cached frozen dataclass.
+
+    Saves the chain of dict lookups and the configured-or-not check that
+    the upload node would otherwise repeat on every workflow run.
+    """
+    return _structurizr_config(config_path, os.path.getmtime(config_path))
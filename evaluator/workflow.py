@@ -1,74 +1,278 @@
 """
 workflow.py - Orchestrates the evaluation workflow using LangGraph
 """
-import yaml
-from typing import Dict, Any, Literal
+import collections
+import functools
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Literal, TypedDict
 from langgraph.graph import StateGraph, END
-from langchain_openai import ChatOpenAI
 import os
 from pathlib import Path
-from langchain_core.tracers import LangChainTracer
-from langchain.callbacks.manager import CallbackManager
 
-from evaluator.codebase_analyser import PythonAnalyser
-from evaluator.codebase_evaluator import ComplexityEvaluator
-from evaluator.c4_generator import C4DiagramGenerator, StructurizrDSLValidator
+from evaluator.config import get_config, get_structurizr_config
+
+# The analyser/evaluator/generator modules pull in the LangChain +
+# httpx + pydantic graph; nodes import them on first use (the pattern
+# recovery_agent_node already follows) so importing this module - or
+# running a path that skips a node - stays cheap.
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+# Module logger; main() configures the handler. Routing messages are
+# DEBUG so production runs skip them before any formatting happens.
+logger = logging.getLogger("road_agent")
+
+
+class WorkflowState(TypedDict, total=False):
+    """
+    Workflow state schema.
+
+    Declaring the fields lets LangGraph manage each as its own channel
+    with last-value-wins updates, instead of treating the whole state as
+    one opaque blob - nodes only pay for the keys they touch. All fields
+    are optional because the entry state carries only a subset.
+    """
+    codebase_path: str
+    config_path: str
+    project_name: str
+    config: Dict[str, Any]
+    analysis: Dict[str, Any]
+    file_index: list
+    decision: Dict[str, Any]
+    c4_result: Dict[str, Any]
+    structurizr_result: Dict[str, Any]
+    recovery_result: Dict[str, Any]
+    upload_error: str
+    dsl_file: str
+    summary: str
+
+__all__ = ["create_workflow", "get_workflow", "analyse_node", "evaluate_node"]
+
+# Optional checkpointing - langgraph's sqlite saver ships separately.
+# Only the async variant is usable here: the graph is driven through
+# ainvoke (main.py), and the sync SqliteSaver raises NotImplementedError
+# from langgraph's async loop instead of falling back
+try:
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+except ImportError:
+    AsyncSqliteSaver = None
+
+# Optional fast JSON for checkpoint rows; the state is plain dicts so
+# nothing is lost by swapping the serializer out
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class _OrjsonSerde:
+    """
+    orjson-backed SerializerProtocol for checkpointed workflow state.
+
+    The state is plain JSON-able dicts, so anything orjson rejects falls
+    back to the default pickle path under its own type tag.
+    """
+
+    def dumps_typed(self, obj):
+        try:
+            return "json", orjson.dumps(obj)
+        except TypeError:
+            import pickle as _pickle
+            return "pickle", _pickle.dumps(obj)
+
+    def loads_typed(self, data):
+        type_, payload = data
+        if type_ == "json":
+            return orjson.loads(payload)
+        import pickle as _pickle
+        return _pickle.loads(payload)
+
+# Tracing is opt-in: unconditionally enabling it costs a LangSmith
+# client init on import even when nobody is looking at the traces
+if os.getenv("ROAD_AGENT_TRACE") == "1":
+    os.environ["LANGCHAIN_TRACING_V2"] = "true"
+    os.environ["LANGCHAIN_PROJECT"] = "road-agent-orchestration"
+
+
+@functools.lru_cache(maxsize=4)
+def _get_llm(model: str, temperature: float, max_tokens) -> "ChatOpenAI":
+    """
+    Shared ChatOpenAI per settings tuple.
+
+    Rebuilding the client per node tears down a warm httpx connection
+    pool each time; reusing it keeps the TLS session to the API alive
+    across nodes and across workflow runs. The import lives here so
+    paths that never reach an LLM call skip the langchain/httpx/pydantic
+    import cost entirely.
+    """
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=model, temperature=temperature, max_tokens=max_tokens)
+
+
+# Opt-in tokenizer warmup: tiktoken loads lazily and its first use costs
+# noticeable latency, so long-running callers can pay it at import time
+if os.environ.get("ROAD_AGENT_WARM_TOKENIZER"):
+    try:
+        from langchain_openai import ChatOpenAI
+        ChatOpenAI(model="gpt-4", temperature=0).get_num_tokens("warmup")
+    except Exception:
+        pass
+
+
+# Evaluation decisions cached by analysis content, so an unchanged tree
+# skips the evaluation LLM call entirely on reruns
+_DECISION_CACHE_DIR = os.path.join(
+    os.path.expanduser('~'), '.cache', 'road-agent', 'decisions'
+)
+
+
+def _analysis_fingerprint(analysis: Dict[str, Any]) -> str:
+    """Stable digest of everything the evaluation prompt is built from"""
+    # imports and frameworks are materialized from sets, so their order
+    # varies per process under hash randomization - sort them or the
+    # same tree fingerprints differently on every run
+    metrics = analysis['metrics']
+    payload = {
+        'metrics': {
+            **metrics,
+            'imports': sorted(metrics.get('imports', [])),
+            'frameworks': sorted(metrics.get('frameworks', []))
+        },
+        'structure': analysis['structure'],
+        'samples': analysis['samples']
+    }
+    return hashlib.blake2b(
+        json.dumps(payload, sort_keys=True).encode(), digest_size=16
+    ).hexdigest()
+
+
+def _load_cached_decision(fingerprint: str):
+    try:
+        with open(os.path.join(_DECISION_CACHE_DIR, fingerprint + '.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cached_decision(fingerprint: str, decision: Dict[str, Any]) -> None:
+    """Write atomically; failure to cache is not an error"""
+    try:
+        os.makedirs(_DECISION_CACHE_DIR, exist_ok=True)
+        path = os.path.join(_DECISION_CACHE_DIR, fingerprint + '.json')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(decision, f)
+        os.replace(tmp_path, path)
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+# Single worker is enough: upload prep is one client construction that
+# just needs to overlap the (much longer) C4 generation LLM call
+_UPLOAD_PREP_POOL = ThreadPoolExecutor(max_workers=1)
+
+# In-flight upload-prep futures keyed by config path. Kept out of the
+# graph state on purpose: a live Future cannot be checkpointed
+_UPLOAD_CLIENT_FUTURES: Dict[str, Any] = {}
+
+
+def _atomic_write_bytes(path: str, data: bytes) -> None:
+    """Write data to path via a temp file and rename, in raw byte I/O"""
+    tmp_path = path + '.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
+
+
+def _prepare_upload_client(config_path: str):
+    """Build the Structurizr client off the hot path; None if unconfigured"""
+    from cli.upload_dsl import get_client
+    try:
+        return get_client(config_path=config_path)
+    except Exception:
+        return None
 
-# Set up tracing
-os.environ["LANGCHAIN_TRACING_V2"] = "true"
-os.environ["LANGCHAIN_PROJECT"] = "road-agent-orchestration"
 
 def analyse_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """Node 1: Analyze the codebase"""
     config_path = state.get('config_path', 'config.yaml')
+    # Parse the config once here; every later node reads it from state
+    state['config'] = get_config(config_path)
+    from evaluator.codebase_analyser import PythonAnalyser
     analyser = PythonAnalyser(config_path)
     state['analysis'] = analyser.analyse_codebase(state['codebase_path'])
+    # Downstream nodes reuse this walk instead of re-scanning the tree
+    state['file_index'] = state['analysis'].get('file_index')
+    # Prompt strings are derived once here rather than per prompt build
+    from evaluator.codebase_evaluator import build_prompt_payload
+    state['analysis']['prompt_payload'] = build_prompt_payload(state['analysis'])
     return state
 
 
-def evaluate_node(state:Dict[str, Any]) -> Dict[str, Any]:
+async def evaluate_node(state:Dict[str, Any]) -> Dict[str, Any]:
     """Node 2: Evaluate complexity with LLM"""
     config_path = state.get('config_path', 'config.yaml')
+    config = state.get('config') or get_config(config_path)
 
-    # load config for LLM settings 
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
+    # An unchanged analysis gets an unchanged decision - skip the LLM
+    fingerprint = _analysis_fingerprint(state['analysis'])
+    cached = _load_cached_decision(fingerprint)
+    if cached is not None:
+        state['decision'] = cached
+        return state
 
     llm_config = config['llm']
-    llm = ChatOpenAI(
-        model=llm_config['model'],
-        temperature=llm_config['temperature'],
-        max_tokens=llm_config.get('max_tokens')
+    llm = _get_llm(
+        llm_config['model'],
+        llm_config['temperature'],
+        llm_config.get('max_tokens')
     )
 
+    from evaluator.codebase_evaluator import ComplexityEvaluator
     evaluator = ComplexityEvaluator(llm)
-    state['decision'] = evaluator.evaluate(state['analysis'])
+    state['decision'] = await evaluator.aevaluate(state['analysis'])
+    _save_cached_decision(fingerprint, state['decision'])
     return state
 
-def generate_c4_node(state: Dict[str, Any]) -> Dict[str, Any]:
+async def generate_c4_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """Node 3: Generate C4 diagrams from the actual codebase"""
     config_path = state.get('config_path', 'config.yaml')
     project_name = state.get('project_name', 'System')
     codebase_path = state['codebase_path']
-    
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
-    
+    config = state.get('config') or get_config(config_path)
+
     llm_config = config['llm']
-    llm = ChatOpenAI(
-        model=llm_config['model'],
-        temperature=llm_config.get('c4_temperature', 0.1),
-        max_tokens=llm_config.get('c4_max_tokens', 4000)
+    llm = _get_llm(
+        llm_config['model'],
+        llm_config.get('c4_temperature', 0.1),
+        llm_config.get('c4_max_tokens', 4000)
     )
     
-    print(f"Reading entire codebase from: {codebase_path}")
-    
+    logger.info("Reading entire codebase from: %s", codebase_path)
+
+    # Upload prep (config stat, client construction) has no dependency
+    # on the DSL, so it runs concurrently with the LLM call below
+    _UPLOAD_CLIENT_FUTURES[config_path] = _UPLOAD_PREP_POOL.submit(
+        _prepare_upload_client, config_path
+    )
+
     # Generate C4 from the codebase
+    from evaluator.c4_generator import C4DiagramGenerator, StructurizrDSLValidator
     generator = C4DiagramGenerator(llm, config_path)
-    result = generator.generate_c4_dsl(codebase_path, project_name)
+    result = await generator.agenerate_c4_dsl(
+        codebase_path, project_name, files=state.get('file_index')
+    )
     
-    print(f"Fed {result['files_processed']} files to LLM")
-    print("LLM is analyzing the complete code...")
+    logger.info("Fed %s files to LLM", result['files_processed'])
+    logger.info("LLM is analyzing the complete code...")
     
     # Validate the generated DSL
     validator = StructurizrDSLValidator()
@@ -106,26 +310,19 @@ def skip_c4_node(state: Dict[str, Any]) -> Dict[str, Any]:
 def upload_structurizr_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """Node 4: Upload to Structurizr"""
     config_path = state.get('config_path', 'config.yaml')
-    
-    # Load config
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
-    
-    structurizr_config = config.get('structurizr', {})
-    
+
     # Check if Structurizr is configured
-    if not all([
-        structurizr_config.get('api_key'),
-        structurizr_config.get('api_secret'),
-        structurizr_config.get('workspace_id')
-    ]):
-        print("Structurizr not configured. To enable upload:")
-        print("1. Get API credentials from https://structurizr.com/help/web-api")
-        print("2. Add to config.yaml:")
-        print("structurizr:")
-        print("api_key: 'your-key'")
-        print("api_secret: 'your-secret'")
-        print("workspace_id: 12345")
+    structurizr_config = get_structurizr_config(config_path)
+    if not structurizr_config.is_configured():
+        logger.info(
+            "Structurizr not configured. To enable upload:\n"
+            "1. Get API credentials from https://structurizr.com/help/web-api\n"
+            "2. Add to config.yaml:\n"
+            "structurizr:\n"
+            "api_key: 'your-key'\n"
+            "api_secret: 'your-secret'\n"
+            "workspace_id: 12345"
+        )
         
         state['structurizr_result'] = {
             'success': False,
@@ -137,35 +334,39 @@ def upload_structurizr_node(state: Dict[str, Any]) -> Dict[str, Any]:
     c4_result = state.get('c4_result', {})
     dsl_content = c4_result.get('dsl')
     if not dsl_content:
-        print("No DSL content to upload to Structurizr.")
+        logger.info("No DSL content to upload to Structurizr.")
         state['structurizr_result'] = {
             'success': False,
             'message': 'No DSL generated to upload'
         }
         return state
 
-    print("Uploading to Structurizr...")
-    print("=" * 60)
+    logger.info("Uploading to Structurizr...")
+    logger.info("=" * 60)
 
     # Save DSL file
     project_name = Path(state['codebase_path']).name
     dsl_file = f"{project_name.lower().replace(' ', '_')}_c4.dsl"
-    Path(dsl_file).write_text(dsl_content)
+    # Atomic, single-write save: no half-written file if interrupted and
+    # no TextIOWrapper transcoding layer on a multi-MB DSL
+    _atomic_write_bytes(dsl_file, dsl_content.encode('utf-8'))
     
     try:
-        # Call your working upload script directly
-        from cli.upload_dsl import StructurizrClient
+        # Prefer the client prepared while C4 generation was running
+        future = _UPLOAD_CLIENT_FUTURES.pop(config_path, None)
+        upload_client = future.result() if future is not None else None
+        if upload_client is None:
+            from cli.upload_dsl import get_client
+            upload_client = get_client(config_path=config_path)
 
-        upload_client = StructurizrClient(config_path=config_path)
-        
         success = upload_client.upload_dsl_file(
             dsl_file=dsl_file,
             config_path=config_path,
-            open_browser=structurizr_config.get('auto_open_browser', True)
+            open_browser=structurizr_config.auto_open_browser
         )
         
         if success:
-            workspace_url = f"https://structurizr.com/workspace/{structurizr_config['workspace_id']}"
+            workspace_url = f"https://structurizr.com/workspace/{structurizr_config.workspace_id}"
             state['structurizr_result'] = {
                 'upload_status': {'success': True},
                 'urls': {'workspace': workspace_url}
@@ -183,7 +384,7 @@ def upload_structurizr_node(state: Dict[str, Any]) -> Dict[str, Any]:
         # Capture error details for recovery agent  
         state['upload_error'] = str(e)
         state['dsl_file'] = dsl_file
-        print(f"Upload failed: {e}")
+        logger.info("Upload failed: %s", e)
         state['structurizr_result'] = {
             'upload_status': {'success': False},
             'error': str(e)
@@ -193,7 +394,7 @@ def upload_structurizr_node(state: Dict[str, Any]) -> Dict[str, Any]:
 
 def recovery_agent_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """Node: Attempt to recover from upload failures"""
-    print("Upload failed - attempting recovery...")
+    logger.info("Upload failed - attempting recovery...")
     
     from agents.upload_failure_recovery_agent import UploadFailureRecoveryAgent
     
@@ -201,11 +402,10 @@ def recovery_agent_node(state: Dict[str, Any]) -> Dict[str, Any]:
     
     # Get the upload error details from the previous upload attempt
     upload_error = state.get('upload_error', 'Upload failed')
-    print(f"Recovery agent received error: '{upload_error}'")
+    logger.debug("Recovery agent received error: '%s'", upload_error)
     dsl_file = Path(state.get('dsl_file', 'unknown.dsl'))
     
-    with open(state.get('config_path', 'config.yaml'), 'r') as f:
-        config = yaml.safe_load(f)
+    config = state.get('config') or get_config(state.get('config_path', 'config.yaml'))
     
     recovery_result = recovery_agent.diagnose_and_retry(
         error_output=upload_error,
@@ -216,19 +416,19 @@ def recovery_agent_node(state: Dict[str, Any]) -> Dict[str, Any]:
     state['recovery_result'] = recovery_result
     
     if recovery_result['recovery_successful']:
-        print(f"Recovery successful using: {recovery_result.get('method', 'unknown')}")
+        logger.info("Recovery successful using: %s", recovery_result.get('method', 'unknown'))
         # Update the structurizr_result to reflect success
         state['structurizr_result']['upload_status']['success'] = True
     else:
-        print("Recovery failed. Manual steps:")
+        logger.info("Recovery failed. Manual steps:")
         for instruction in recovery_result.get('instructions', []):
-            print(f"  {instruction}")
+            logger.info("  %s", instruction)
     
     return state
     
 def skip_upload_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """Node 4b: Skip upload if no DSL generated"""
-    print("Skipping Structurizr upload - no DSL to upload")
+    logger.info("Skipping Structurizr upload - no DSL to upload")
     
     state['structurizr_result'] = {
         'success': False,
@@ -236,41 +436,61 @@ def skip_upload_node(state: Dict[str, Any]) -> Dict[str, Any]:
     }
     return state
 
+# Built once; summary_node fills it with format_map so the whole report
+# is one string and one log record instead of a line-by-line build
+_SUMMARY_TEMPLATE = """
+{rule}
+PIPELINE COMPLETE
+{rule}
+Codebase: {codebase_path}
+Files: {files}, Lines: {lines}
+Evaluation:
+Complexity: {complexity}
+Can generate C4: {can_generate}
+{c4_section}{structurizr_section}"""
+
+
 def summary_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """Node 5: Final summary"""
-    print("\n" + "=" * 60)
-    print("PIPELINE COMPLETE")
-    print("=" * 60)
-    
-    # Analysis summary
     metrics = state['analysis']['metrics']
-    print(f"Codebase: {state['codebase_path']}")
-    print(f"Files: {metrics['files']}, Lines: {metrics['lines']}")
-    
-    # Evaluation summary
     decision = state['decision']
-    print(f"Evaluation:")
-    print(f"Complexity: {decision.get('complexity_level', 'unknown').upper()}")
-    print(f"Can generate C4: {'Yes' if decision.get('can_use_llm') else 'No'}")
-    
+
     # C4 Generation summary
     if state.get('c4_result', {}).get('dsl'):
-        print(f"C4 Generation:")
-        print(f"Status: Success")
+        c4_section = "C4 Generation:\nStatus: Success\n"
         if state.get('dsl_file'):
-            print(f"DSL file: {state['dsl_file']}")
+            c4_section += f"DSL file: {state['dsl_file']}\n"
     else:
-        print(f"C4 Generation: Skipped")
-    
+        c4_section = "C4 Generation: Skipped\n"
+
     # Structurizr summary
     structurizr_result = state.get('structurizr_result', {})
     if structurizr_result.get('success'):
-        print(f"Structurizr:")
-        print(f"Status: Uploaded")
-        print(f"Workspace: {structurizr_result['urls']['workspace']}")
+        structurizr_section = (
+            "Structurizr:\nStatus: Uploaded\n"
+            f"Workspace: {structurizr_result['urls']['workspace']}\n"
+        )
     elif structurizr_result.get('instructions'):
-        print(f"Structurizr: Manual upload required")
-        print(f"DSL Editor: {structurizr_result.get('workspace_url', 'https://structurizr.com/dsl')}")
+        editor = structurizr_result.get('workspace_url', 'https://structurizr.com/dsl')
+        structurizr_section = (
+            "Structurizr: Manual upload required\n"
+            f"DSL Editor: {editor}\n"
+        )
+    else:
+        structurizr_section = ""
+
+    view = collections.defaultdict(
+        lambda: 'N/A',
+        rule="=" * 60,
+        codebase_path=state['codebase_path'],
+        files=metrics['files'],
+        lines=metrics['lines'],
+        complexity=decision.get('complexity_level', 'unknown').upper(),
+        can_generate='Yes' if decision.get('can_use_llm') else 'No',
+        c4_section=c4_section,
+        structurizr_section=structurizr_section
+    )
+    logger.info("%s", _SUMMARY_TEMPLATE.format_map(view).rstrip())
 
     state['summary'] = "Pipeline execution complete"
     return state
@@ -282,10 +502,10 @@ def should_generate_c4(state: Dict[str, Any]) -> Literal["generate_c4", "skip_c4
     can_generate = decision.get('can_use_llm', False)
     
     if can_generate:
-        print("Routing to generate_c4")
+        logger.debug("Routing to generate_c4")
         return "generate_c4"
     else:
-        print("DEBUG: Routing to skip_c4")  
+        logger.debug("Routing to skip_c4")
         return "skip_c4"
 
 def should_upload_structurizr(state: Dict[str, Any]) -> Literal["upload_structurizr", "skip_upload"]:
@@ -294,26 +514,23 @@ def should_upload_structurizr(state: Dict[str, Any]) -> Literal["upload_structur
     dsl_content = c4_result.get('dsl')
     
     if dsl_content:
-        print("Routing to upload_structurizr")
+        logger.debug("Routing to upload_structurizr")
         return "upload_structurizr"
     else:
-        print("Routing to skip_upload")
+        logger.debug("Routing to skip_upload")
         return "skip_upload"
     
 def should_attempt_recovery(state: Dict[str, Any]) -> Literal["recovery", "summary"]:
+    # Only a failed upload attempt (which records upload_error) is worth
+    # the recovery agent; unconfigured/no-DSL outcomes go straight on
     upload_result = state.get('structurizr_result', {})
-    if not upload_result.get('upload_status', {}).get('success', False):
+    if state.get('upload_error') and not upload_result.get('upload_status', {}).get('success', False):
         return "recovery"
     return "summary"
 
 def create_workflow():
     """Create the evaluation workflow"""
-    workflow = StateGraph(Dict[str, Any])
-
-    # Add tracing callback
-    tracer = LangChainTracer(project_name="road-agent-orchestration")
-    callback_manager = CallbackManager([tracer])
-    
+    workflow = StateGraph(WorkflowState)
 
     # Add nodes
     workflow.add_node("analyse", analyse_node)
@@ -365,5 +582,29 @@ def create_workflow():
     workflow.add_edge("recovery_agent", "summary")
     workflow.add_edge("summary", END)
     
+    # Checkpoint completed nodes so a retry after an upload failure can
+    # resume instead of re-running analysis and C4 generation
+    if AsyncSqliteSaver is not None:
+        # aiosqlite connects lazily - the saver awaits the connection on
+        # first use, inside the running event loop
+        conn = aiosqlite.connect(".workflow_state.db")
+        if orjson is not None:
+            # The analysis dict is the bulk of each checkpoint row;
+            # orjson serialises it several times faster than stdlib
+            return workflow.compile(checkpointer=AsyncSqliteSaver(conn, serde=_OrjsonSerde()))
+        return workflow.compile(checkpointer=AsyncSqliteSaver(conn))
+
     return workflow.compile()
 
+
+@functools.lru_cache(maxsize=1)
+def get_workflow():
+    """
+    Return the compiled workflow, building it on first call.
+
+    Compiling the StateGraph (topological sort, edge validation) is pure
+    overhead to repeat per run; the compiled graph is stateless between
+    invocations, so library callers invoking many times share one. Kept
+    lazy rather than compiled at import so module import stays cheap.
+    """
+    return create_workflow()
@@ -2,13 +2,14 @@
 main.py - Run the codebase evaluator with optional Structurizr upload
 """
 import sys
+import asyncio
+import hashlib
+import logging
 import os
 from pathlib import Path
-from evaluator.c4_generator import generate_c4_from_codebase
-from evaluator.workflow import create_workflow
 import argparse
 
-def evaluate_codebase(path: str, verbose: bool = True, upload_to_structurizr: bool = False):
+async def evaluate_codebase(path: str, verbose: bool = True, upload_to_structurizr: bool = False):
     """
     Evaluate a Python codebase for C4 diagram generation
     
@@ -28,9 +29,14 @@ def evaluate_codebase(path: str, verbose: bool = True, upload_to_structurizr: bo
     if verbose:
         print(f"Evaluating: {codebase_path}")
         print("=" * 60)
-    
-    # Create and run workflow
-    workflow = create_workflow()
+
+    # Imported here rather than at module top so --help/--setup-help and
+    # argument errors never load the LangGraph/OpenAI stack
+    from evaluator.c4_generator import generate_c4_from_codebase
+    from evaluator.workflow import get_workflow
+
+    # Create and run workflow (compiled once, shared across calls)
+    workflow = get_workflow()
     
     initial_state = {
         "codebase_path": str(codebase_path.absolute()),
@@ -40,8 +46,13 @@ def evaluate_codebase(path: str, verbose: bool = True, upload_to_structurizr: bo
         "config_path": "config.yaml"  # Add config_path to state
     }
     
-    # Run the workflow
-    result = workflow.invoke(initial_state)
+    # Run the workflow; the thread id is stable per codebase path so a
+    # checkpointer (when installed) can resume an interrupted run
+    thread_id = hashlib.sha1(str(codebase_path.absolute()).encode()).hexdigest()
+    result = await workflow.ainvoke(
+        initial_state,
+        config={"configurable": {"thread_id": thread_id}}
+    )
     
     if verbose:
         print(result['summary'])
@@ -145,7 +156,15 @@ Examples:
     )
     
     args = parser.parse_args()
-    
+
+    # Workflow nodes log through the "road_agent" logger; one buffered
+    # handler here replaces their per-line print() syscalls
+    logging.basicConfig(
+        level=logging.WARNING if args.quiet else logging.INFO,
+        format="%(message)s",
+        stream=sys.stdout
+    )
+
     # Show setup help if requested
     if args.setup_help:
         print("""
@@ -203,12 +222,12 @@ any API setup!
     
     try:
         # Run evaluation
-        decision = evaluate_codebase(
+        decision = asyncio.run(evaluate_codebase(
             path=args.codebase_path,
             verbose=not args.quiet,
             upload_to_structurizr=args.upload
-        )
-        
+        ))
+
         # Determine exit code
         success = decision and isinstance(decision, dict) and decision.get('can_use_llm')
         exit_code = 0 if success else 1
@@ -11,7 +11,10 @@ import yaml
 from evaluator.c4_generator import (
     C4DiagramGenerator,
     StructurizrDSLValidator,
-    generate_c4_from_codebase
+    generate_c4_from_codebase,
+    _match_brace,
+    _match_brace_vectorised,
+    _VECTOR_BRACE_THRESHOLD
 )
 
 
@@ -522,5 +525,60 @@ class TestGenerateC4FromCodebase(unittest.TestCase):
         self.assertIn('too complex', result['error'])
 
 
+class TestMatchBrace(unittest.TestCase):
+    """Test the brace matcher and its vectorised large-input path"""
+
+    def test_match_simple_block(self):
+        """Test matching a flat brace pair"""
+        text = 'workspace { model }'
+        self.assertEqual(_match_brace(text), text.index('}') + 1)
+
+    def test_match_nested_blocks(self):
+        """Test the match lands on the outermost closing brace"""
+        text = 'workspace { model { a { } } } trailing'
+        self.assertEqual(_match_brace(text), text.rindex('}') + 1)
+
+    def test_match_from_offset(self):
+        """Test matching starts at the given offset"""
+        text = '{ first } second { inner }'
+        self.assertEqual(_match_brace(text, text.index('second')), len(text))
+
+    def test_unbalanced_returns_minus_one(self):
+        """Test unbalanced braces report no match"""
+        self.assertEqual(_match_brace('workspace { model {'), -1)
+        self.assertEqual(_match_brace('no braces at all'), -1)
+
+    def test_leading_close_brace_ignored(self):
+        """Test a stray close brace before the first open is skipped"""
+        text = '} } { a { b } }'
+        self.assertEqual(_match_brace(text), len(text))
+
+    def test_vectorised_agrees_with_scalar_walk(self):
+        """Test the large-input path matches the finditer walk"""
+        body = ('element "x" {\n    background #1168bd\n}\n'
+                * (_VECTOR_BRACE_THRESHOLD // 30))
+        text = 'workspace {\n' + body + '}\n trailing prose'
+        self.assertGreater(len(text), _VECTOR_BRACE_THRESHOLD)
+
+        result = _match_brace(text)
+        vectorised = _match_brace_vectorised(text, 0)
+
+        self.assertEqual(result, text.rindex('}') + 1)
+        self.assertEqual(vectorised, result)
+
+    def test_vectorised_declines_leading_close_brace(self):
+        """Test the vectorised path defers when a '}' precedes the '{'"""
+        text = '}' + 'x' * _VECTOR_BRACE_THRESHOLD + '{ a }'
+        self.assertIsNone(_match_brace_vectorised(text, 0))
+        # The scalar fallback still resolves it
+        self.assertEqual(_match_brace(text), len(text))
+
+    def test_vectorised_unbalanced(self):
+        """Test the vectorised path reports unbalanced input"""
+        text = '{' + 'x' * _VECTOR_BRACE_THRESHOLD
+        self.assertEqual(_match_brace_vectorised(text, 0), -1)
+        self.assertEqual(_match_brace_vectorised('no braces', 0), -1)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
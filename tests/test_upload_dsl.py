@@ -0,0 +1,183 @@
+"""
+test_upload_dsl.py - Unit tests for the Structurizr upload CLI helpers
+"""
+import unittest
+import tempfile
+import shutil
+import hashlib
+import json
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import cli.upload_dsl as upload_dsl
+from cli.upload_dsl import (
+    StructurizrClient,
+    upload_dsl_file,
+    upload_dsl_with_cli,
+    upload_many
+)
+
+
+class TestModuleLevelUpload(unittest.TestCase):
+    """Test the module-level upload entry points"""
+
+    @patch('cli.upload_dsl.StructurizrClient')
+    def test_upload_dsl_file_builds_client(self, mock_client_class):
+        """Test upload_dsl_file constructs a client and delegates"""
+        mock_client = Mock()
+        mock_client.upload_dsl_file.return_value = True
+        mock_client_class.return_value = mock_client
+
+        result = upload_dsl_file(
+            'system_c4.dsl',
+            api_key='key',
+            api_secret='secret',
+            workspace_id=42,
+            open_browser=False
+        )
+
+        self.assertTrue(result)
+        mock_client_class.assert_called_once_with(
+            api_key='key',
+            api_secret='secret',
+            workspace_id=42,
+            config_path='config.yaml'
+        )
+        mock_client.upload_dsl_file.assert_called_once_with(
+            dsl_file='system_c4.dsl',
+            api_key='key',
+            api_secret='secret',
+            workspace_id=42,
+            config_path='config.yaml',
+            open_browser=False
+        )
+
+    @patch('cli.upload_dsl.StructurizrClient')
+    def test_upload_dsl_with_cli_wrapper(self, mock_client_class):
+        """Test upload_dsl_with_cli delegates to the client method"""
+        mock_client = Mock()
+        mock_client.upload_dsl_with_cli.return_value = False
+        mock_client_class.return_value = mock_client
+
+        result = upload_dsl_with_cli(
+            'system_c4.dsl',
+            api_key='key',
+            api_secret='secret',
+            workspace_id=42,
+            open_browser=False
+        )
+
+        self.assertFalse(result)
+        mock_client.upload_dsl_with_cli.assert_called_once()
+
+    @patch('cli.upload_dsl.get_client')
+    def test_upload_many_uploads_each_file(self, mock_get_client):
+        """Test upload_many pushes every file without opening browsers"""
+        mock_client = Mock()
+        mock_client.upload_dsl_file.side_effect = [True, False, True]
+        mock_get_client.return_value = mock_client
+
+        results = upload_many(['a.dsl', 'b.dsl', 'c.dsl'])
+
+        self.assertEqual(results, [True, False, True])
+        self.assertEqual(mock_client.upload_dsl_file.call_count, 3)
+        for call in mock_client.upload_dsl_file.call_args_list:
+            self.assertFalse(call.kwargs['open_browser'])
+
+    @patch('cli.upload_dsl.get_client')
+    def test_upload_many_empty_list(self, mock_get_client):
+        """Test upload_many handles an empty batch"""
+        mock_get_client.return_value = Mock()
+
+        self.assertEqual(upload_many([]), [])
+
+
+class TestUploadSkipCache(unittest.TestCase):
+    """Test the byte-identical-DSL upload skip cache"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.test_dir = tempfile.mkdtemp()
+        self.test_path = Path(self.test_dir)
+
+        self.dsl_file = self.test_path / 'system_c4.dsl'
+        self.dsl_content = b'workspace {\n    model {\n    }\n}\n'
+        self.dsl_file.write_bytes(self.dsl_content)
+        self.dsl_hash = hashlib.sha256(self.dsl_content).hexdigest()
+
+        self.cache_path = self.test_path / '.structurizr_upload_cache.json'
+        patcher = patch.object(upload_dsl, '_UPLOAD_CACHE_PATH', self.cache_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = StructurizrClient(
+            api_key='key', api_secret='secret', workspace_id=42
+        )
+
+    def tearDown(self):
+        """Clean up"""
+        shutil.rmtree(self.test_dir)
+
+    @patch('cli.upload_dsl.subprocess.run')
+    def test_unchanged_dsl_skips_cli(self, mock_run):
+        """Test a matching cached hash short-circuits the upload"""
+        self.cache_path.write_text(json.dumps({'42': self.dsl_hash}))
+
+        result = self.client.upload_dsl_with_cli(
+            str(self.dsl_file), 'key', 'secret', 42, open_browser=False
+        )
+
+        self.assertTrue(result)
+        mock_run.assert_not_called()
+
+    @patch('cli.upload_dsl.subprocess.run')
+    def test_changed_dsl_still_uploads(self, mock_run):
+        """Test a stale cached hash does not suppress the upload"""
+        self.cache_path.write_text(json.dumps({'42': 'deadbeef'}))
+        mock_run.return_value = Mock(returncode=0, stdout=b'', stderr=b'')
+
+        result = self.client.upload_dsl_with_cli(
+            str(self.dsl_file), 'key', 'secret', 42, open_browser=False
+        )
+
+        self.assertTrue(result)
+        mock_run.assert_called_once()
+
+    @patch('cli.upload_dsl.subprocess.run')
+    def test_successful_upload_records_hash(self, mock_run):
+        """Test a successful push writes the hash back to the cache"""
+        mock_run.return_value = Mock(returncode=0, stdout=b'', stderr=b'')
+
+        self.client.upload_dsl_with_cli(
+            str(self.dsl_file), 'key', 'secret', 42, open_browser=False
+        )
+
+        cache = json.loads(self.cache_path.read_text())
+        self.assertEqual(cache['42'], self.dsl_hash)
+
+    @patch('cli.upload_dsl.subprocess.run')
+    def test_failed_upload_records_nothing(self, mock_run):
+        """Test a failed push leaves the cache empty so retries happen"""
+        mock_run.return_value = Mock(returncode=1, stdout=b'', stderr=b'boom')
+
+        result = self.client.upload_dsl_with_cli(
+            str(self.dsl_file), 'key', 'secret', 42, open_browser=False
+        )
+
+        self.assertFalse(result)
+        self.assertFalse(self.cache_path.exists())
+
+    @patch('cli.upload_dsl.subprocess.run')
+    def test_missing_dsl_file(self, mock_run):
+        """Test a missing DSL file fails without spawning the CLI"""
+        result = self.client.upload_dsl_with_cli(
+            str(self.test_path / 'missing.dsl'), 'key', 'secret', 42,
+            open_browser=False
+        )
+
+        self.assertFalse(result)
+        mock_run.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()